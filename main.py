@@ -1,14 +1,16 @@
 import os
 import sys
 import hashlib
+import hmac
+from collections import deque
 from datetime import datetime
-from typing import Optional, Dict, List
+from functools import lru_cache
+from typing import Any, Optional, Dict, List, Tuple
 
-import customtkinter as ctk
-from PIL import Image
+import numpy as np
 from peewee import (
+    JOIN,
     Model,
-    SqliteDatabase,
     AutoField,
     CharField,
     BooleanField,
@@ -18,6 +20,7 @@ from peewee import (
     TextField,
     IntegerField,
 )
+from playhouse.pool import PooledSqliteDatabase
 
 
 # =========================
@@ -30,7 +33,18 @@ def app_base_path() -> str:
 
 
 DB_PATH = os.path.join(app_base_path(), "delivery.db")
-db = SqliteDatabase(DB_PATH, pragmas={"foreign_keys": 1})
+# Bump on any model/field/index change: seed_data skips create_tables once user_version reaches it.
+SCHEMA_VERSION = 1
+DB_PRAGMAS = {
+    "foreign_keys": 1,
+    "journal_mode": "wal",
+    "synchronous": "NORMAL",
+    "cache_size": -64000,
+    "temp_store": "MEMORY",
+    "mmap_size": 268435456,
+    "busy_timeout": 5000,
+}
+db = PooledSqliteDatabase(DB_PATH, max_connections=4, stale_timeout=300, pragmas=DB_PRAGMAS)
 
 
 # =========================
@@ -52,7 +66,7 @@ class Usuario(BaseModel):
 class Motoboy(BaseModel):
     id = AutoField()
     nome = CharField(unique=True)
-    ativo = BooleanField(default=True)
+    ativo = BooleanField(default=True, index=True)
 
 
 class Bairro(BaseModel):
@@ -86,7 +100,10 @@ class Pedido(BaseModel):
     forma_pagamento = CharField(default="PIX")
     pix_confirmado = BooleanField(default=False)
     observacao = TextField(null=True)
-    criado_em = DateTimeField(default=datetime.now)
+    criado_em = DateTimeField(default=datetime.now, index=True)
+
+    class Meta:
+        indexes = ((("status", "criado_em"), False),)
 
 
 class LogAtividade(BaseModel):
@@ -100,21 +117,88 @@ class LogAtividade(BaseModel):
 # =========================
 # CONTROLLER
 # =========================
+SQL_CONFIRM_PIX = 'UPDATE "pedido" SET "pix_confirmado" = ?, "status" = ? WHERE "id" = ?'
+SQL_RECEIVE_PAYMENT = 'UPDATE "pedido" SET "forma_pagamento" = ? WHERE "id" = ?'
+
+LOG_FLUSH_MS = 2000
+LOG_FLUSH_MAX_MS = 60_000
+
+ORDER_ARRAY_DTYPE = [("id", "i8"), ("vt", "f8"), ("tx", "f8"), ("ts", "f8"), ("cancelado", "?")]
+
+
 class OrderController:
     def __init__(self, usuario_logado: Usuario):
         self.usuario = usuario_logado
+        self.order_array = np.empty(0, dtype=ORDER_ARRAY_DTYPE)
+        self._log_queue = deque()
 
     def log(self, acao: str, pedido: Optional[Pedido] = None):
-        LogAtividade.create(usuario=self.usuario, acao=acao, pedido=pedido)
+        self._log_queue.append({"usuario": self.usuario, "acao": acao, "pedido": pedido, "criado_em": datetime.now()})
+
+    def flush_logs(self):
+        if not self._log_queue:
+            return
+        rows = list(self._log_queue)
+        with db.atomic():
+            LogAtividade.insert_many(rows).execute()
+        self._log_queue.clear()
+
+    def orders_query(self):
+        return (
+            Pedido.select(
+                Pedido.id,
+                Pedido.cliente,
+                Pedido.canal,
+                Pedido.status,
+                Pedido.valor_produtos,
+                Pedido.taxa_entrega,
+                Pedido.valor_total,
+                Pedido.forma_pagamento,
+                Pedido.pix_confirmado,
+                Pedido.observacao,
+                Pedido.criado_em,
+                Bairro.nome.alias("bairro_nome"),
+                Motoboy.nome.alias("motoboy_nome"),
+            )
+            .join(Bairro, JOIN.LEFT_OUTER)
+            .switch(Pedido)
+            .join(Motoboy, JOIN.LEFT_OUTER)
+            .dicts()
+        )
 
-    def fetch_orders(self) -> List[Pedido]:
-        return list(Pedido.select().order_by(Pedido.id.desc()))
+    def fetch_orders(self) -> List[Dict[str, Any]]:
+        rows = list(self.orders_query().order_by(Pedido.id.desc()))
+        self.order_array = np.array(
+            [(p["id"], p["valor_total"], p["taxa_entrega"], p["criado_em"].timestamp(), p["status"] == "CANCELADO") for p in rows],
+            dtype=ORDER_ARRAY_DTYPE,
+        )
+        return rows
+
+    def update_order_array(self, row: Dict[str, Any]):
+        idx = np.flatnonzero(self.order_array["id"] == row["id"])
+        if idx.size:
+            self.order_array[idx[0]] = (
+                row["id"],
+                row["valor_total"],
+                row["taxa_entrega"],
+                row["criado_em"].timestamp(),
+                row["status"] == "CANCELADO",
+            )
+
+    def summary_today(self, now: datetime) -> Tuple[int, float]:
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+        arr = self.order_array
+        today = arr[(arr["ts"] >= start) & ~arr["cancelado"]]
+        return int(today.shape[0]), float(today["vt"].sum())
+
+    def fetch_order(self, pedido_id: int) -> Dict[str, Any]:
+        return self.orders_query().where(Pedido.id == pedido_id).get()
 
     def confirm_pix(self, pedido: Pedido):
         pedido.pix_confirmado = True
         if pedido.status == "PIX PENDENTE":
             pedido.status = "EM PREPARO"
-        pedido.save()
+        db.execute_sql(SQL_CONFIRM_PIX, (True, pedido.status, pedido.id))
         self.log("Confirmou PIX", pedido)
 
     def assign_motoboy(self, pedido: Pedido, motoboy: Motoboy, status: Optional[str] = None):
@@ -128,7 +212,7 @@ class OrderController:
 
     def receive_payment(self, pedido: Pedido):
         pedido.forma_pagamento = "PAGO"
-        pedido.save()
+        db.execute_sql(SQL_RECEIVE_PAYMENT, (pedido.forma_pagamento, pedido.id))
         self.log("Recebeu pagamento", pedido)
 
     def update_observation(self, pedido: Pedido, obs: str):
@@ -137,6 +221,10 @@ class OrderController:
         self.log("Atualizou observação", pedido)
 
 
+def elapsed_minutes(ts: np.ndarray, now: float) -> np.ndarray:
+    return ((now - ts) // 60).astype(np.int64)
+
+
 # =========================
 # THEMES / TOKENS
 # =========================
@@ -155,530 +243,697 @@ ZOOM_PRESETS = {
     "PEQUENO": {"height": 50, "font": 11},
 }
 
+STATUS_COLORS: Dict[str, str] = {
+    "NOVO": "#7cb342",
+    "EM PREPARO": "#fbc02d",
+    "EM ROTA": "#29b6f6",
+    "FINALIZADO": "#66bb6a",
+    "CANCELADO": "#ef5350",
+    "PIX PENDENTE": "#ff5252",
+}
 
-class OrderCard(ctk.CTkFrame):
-    def __init__(self, parent, order: Pedido, dashboard, height: int, font_size: int):
-        super().__init__(parent, corner_radius=8, border_width=1)
-        self.parent = parent
-        self.order = order
-        self.dashboard = dashboard
-        self.height = height
-        self.font_size = font_size
-        self.pack_propagate(False)
-        self.configure(height=self.height)
-
-        self.top_label = ctk.CTkLabel(self, anchor="w", text="")
-        self.mid_label = ctk.CTkLabel(self, anchor="w", text="")
-        self.bot_label = ctk.CTkLabel(self, anchor="w", text="")
-        self.alert_label = ctk.CTkLabel(self, anchor="w", text="", text_color="#ff4d4d")
-
-        self.top_label.pack(fill="x", padx=10, pady=(6, 0))
-        self.mid_label.pack(fill="x", padx=10)
-        self.bot_label.pack(fill="x", padx=10)
-        self.alert_label.pack(fill="x", padx=10, pady=(0, 6))
-
-        self.bind_all_widgets("<Button-1>", self.on_click)
-        self.bind_all_widgets("<Double-Button-1>", self.on_double_click)
-
-        self.refresh_ui_content()
-
-    def bind_all_widgets(self, event, callback):
-        self.bind(event, callback)
-        for w in (self.top_label, self.mid_label, self.bot_label, self.alert_label):
-            w.bind(event, callback)
-
-    def on_click(self, _event=None):
-        self.dashboard.select_card(self)
-        if self.dashboard.route_mode_active:
-            self.dashboard.route_assign_order(self.order, self)
-
-    def on_double_click(self, _event=None):
-        self.dashboard.select_card(self)
-        self.dashboard.open_action_panel(self)
-
-    def refresh_ui_content(self):
-        theme = self.dashboard.theme_tokens
-        status_color = {
-            "NOVO": "#7cb342",
-            "EM PREPARO": "#fbc02d",
-            "EM ROTA": "#29b6f6",
-            "FINALIZADO": "#66bb6a",
-            "CANCELADO": "#ef5350",
-            "PIX PENDENTE": "#ff5252",
-        }.get(self.order.status, "#cccccc")
-
-        canal_color = {
-            "IFOOD": "#ff5722",
-            "WHATSAPP": "#43a047",
-            "BALCÃO": "#8e24aa",
-        }.get(self.order.canal.upper(), "#607d8b")
-
-        default_bg = theme["card"]
-        alert_texts = []
-        bg = default_bg
-
-        if self.order.forma_pagamento.upper() == "PIX" and not self.order.pix_confirmado:
-            bg = "#420000"
-            alert_texts.append("⚠️ PIX PENDENTE")
-
-        if self.order.canal.upper() == "BALCÃO" and self.order.forma_pagamento.upper() == "A RECEBER":
-            alert_texts.append("💰 PAGAR NA RETIRADA")
-
-        if self.order.observacao:
-            alert_texts.append("❗ VER OBS")
-
-        selected = self.dashboard.selected_card is self
-        border_color = "#00008B" if selected else "#555555"
-        border_width = 5 if selected else 1
-        fg_color = "#1e3557" if selected else bg
-
-        self.configure(border_color=border_color, border_width=border_width, fg_color=fg_color)
-
-        bairro = self.order.bairro.nome if self.order.bairro else "-"
-        moto = self.order.motoboy.nome if self.order.motoboy else "Sem motoboy"
-        elapsed = datetime.now() - self.order.criado_em
-        mins = int(elapsed.total_seconds() // 60)
-
-        self.top_label.configure(
-            text=f"#{self.order.id} | {self.order.cliente} | [{self.order.canal}]",
-            text_color=canal_color,
-            font=("Segoe UI", self.font_size, "bold"),
-        )
-        self.mid_label.configure(
-            text=f"{self.order.status} | R$ {self.order.valor_produtos:.2f} + R$ {self.order.taxa_entrega:.2f} = R$ {self.order.valor_total:.2f}",
-            text_color=status_color,
-            font=("Segoe UI", self.font_size),
-        )
-        self.bot_label.configure(
-            text=f"{bairro} | 🛵 {moto} | {self.order.forma_pagamento} | ⏱️ {mins} min",
-            text_color=theme["text"],
-            font=("Segoe UI", max(10, self.font_size - 1)),
-        )
-        self.alert_label.configure(
-            text=" • ".join(alert_texts),
-            text_color="#ff6666" if alert_texts else theme["text"],
-            font=("Segoe UI", max(9, self.font_size - 1), "bold"),
-        )
-
-
-class ActionPanelWindow(ctk.CTkToplevel):
-    def __init__(self, dashboard, card: OrderCard):
-        super().__init__(dashboard)
-        self.dashboard = dashboard
-        self.card = card
-        self.order = card.order
-        self.controller = dashboard.controller
+CANAL_COLORS: Dict[str, str] = {
+    "IFOOD": "#ff5722",
+    "WHATSAPP": "#43a047",
+    "BALCÃO": "#8e24aa",
+}
 
-        self.title(f"Pedido #{self.order.id}")
-        self.geometry("430x520")
-        self.protocol("WM_DELETE_WINDOW", self.close)
-        self.bind("<Escape>", lambda _e: self.close())
 
-        self.content = ctk.CTkFrame(self)
-        self.content.pack(fill="both", expand=True, padx=10, pady=10)
+# =========================
+# UI
+# =========================
+@lru_cache(maxsize=None)
+def _build_ui():
+    import tkinter as tk
+
+    import customtkinter as ctk
+
+    class OrderCard(ctk.CTkFrame):
+        click_tag = "BDFOrderCard"
+
+        def __init__(self, parent, order: Dict[str, Any], dashboard, height: int, font_size: int):
+            super().__init__(parent, corner_radius=8, border_width=1)
+            self.parent = parent
+            self.set_order(order)
+            self.dashboard = dashboard
+            self.height = height
+            self.font_size = font_size
+            self.pack_propagate(False)
+            self.configure(height=self.height)
+
+            self._last_style = None
+            self._top_var = tk.StringVar(self)
+            self._mid_var = tk.StringVar(self)
+            self._bot_var = tk.StringVar(self)
+            self._alert_var = tk.StringVar(self)
+
+            self.top_label = ctk.CTkLabel(self, anchor="w", textvariable=self._top_var)
+            self.mid_label = ctk.CTkLabel(self, anchor="w", textvariable=self._mid_var)
+            self.bot_label = ctk.CTkLabel(self, anchor="w", textvariable=self._bot_var)
+            self.alert_label = ctk.CTkLabel(self, anchor="w", textvariable=self._alert_var, text_color="#ff4d4d")
+
+            self.top_label.pack(fill="x", padx=10, pady=(6, 0))
+            self.mid_label.pack(fill="x", padx=10)
+            self.bot_label.pack(fill="x", padx=10)
+            self.alert_label.pack(fill="x", padx=10, pady=(0, 6))
+
+            self.add_click_tag()
+
+            self.refresh_ui_content()
+
+        def add_click_tag(self):
+            widgets = [self._canvas]
+            for lbl in (self.top_label, self.mid_label, self.bot_label, self.alert_label):
+                widgets += [lbl._canvas, lbl._label]
+            for w in widgets:
+                tags = w.bindtags()
+                w.bindtags(tags[:1] + (self.click_tag,) + tags[1:])
+
+        def set_order(self, order: Dict[str, Any]):
+            self.order = order
+            self.canal_upper = order["canal"].upper()
+            self.forma_upper = order["forma_pagamento"].upper()
+
+        def set_density(self, height: int, font_size: int):
+            if height != self.height:
+                self.height = height
+                self.configure(height=height)
+            self.font_size = font_size
+
+        def on_click(self, _event=None):
+            self.dashboard.select_card(self)
+            if self.dashboard.route_mode_active:
+                self.dashboard.route_assign_order(self)
+
+        def on_double_click(self, _event=None):
+            self.dashboard.select_card(self)
+            self.dashboard.open_action_panel(self)
+
+        def bot_text(self, mins: int) -> str:
+            bairro = self.order["bairro_nome"] or "-"
+            moto = self.order["motoboy_nome"] or "Sem motoboy"
+            return f"{bairro} | 🛵 {moto} | {self.order['forma_pagamento']} | ⏱️ {mins} min"
+
+        def update_elapsed(self, mins: int):
+            self._bot_var.set(self.bot_text(mins))
+
+        def refresh_ui_content(self, now: Optional[datetime] = None):
+            if now is None:
+                now = self.dashboard.now_cache
+            theme = self.dashboard.theme_tokens
+            status_color = STATUS_COLORS.get(self.order["status"], "#cccccc")
+            canal_color = CANAL_COLORS.get(self.canal_upper, "#607d8b")
+
+            default_bg = theme["card"]
+            alert_texts = []
+            bg = default_bg
+
+            if self.forma_upper == "PIX" and not self.order["pix_confirmado"]:
+                bg = "#420000"
+                alert_texts.append("⚠️ PIX PENDENTE")
+
+            if self.canal_upper == "BALCÃO" and self.forma_upper == "A RECEBER":
+                alert_texts.append("💰 PAGAR NA RETIRADA")
+
+            if self.order["observacao"]:
+                alert_texts.append("❗ VER OBS")
+
+            selected = self.dashboard.selected_card is self
+            border_color = "#00008B" if selected else "#555555"
+            border_width = 5 if selected else 1
+            fg_color = "#1e3557" if selected else bg
+
+            style = (theme["text"], status_color, canal_color, self.font_size, bool(alert_texts), border_color, border_width, fg_color)
+            if style != self._last_style:
+                self._last_style = style
+                self.configure(border_color=border_color, border_width=border_width, fg_color=fg_color)
+                self.top_label.configure(text_color=canal_color, font=("Segoe UI", self.font_size, "bold"))
+                self.mid_label.configure(text_color=status_color, font=("Segoe UI", self.font_size))
+                self.bot_label.configure(text_color=theme["text"], font=("Segoe UI", max(10, self.font_size - 1)))
+                self.alert_label.configure(
+                    text_color="#ff6666" if alert_texts else theme["text"],
+                    font=("Segoe UI", max(9, self.font_size - 1), "bold"),
+                )
 
-        self.title_lbl = ctk.CTkLabel(self.content, text="", anchor="w", font=("Segoe UI", 18, "bold"))
-        self.title_lbl.pack(fill="x", pady=(0, 8))
+            order = self.order
+            mins = int((now - order["criado_em"]).total_seconds() // 60)
 
-        self.info_lbl = ctk.CTkLabel(self.content, text="", justify="left", anchor="w")
-        self.info_lbl.pack(fill="x", pady=(0, 12))
+            self._top_var.set(f"#{order['id']} | {order['cliente']} | [{order['canal']}]")
+            self._mid_var.set(
+                f"{order['status']} | R$ {order['valor_produtos']:.2f} + R$ {order['taxa_entrega']:.2f} = R$ {order['valor_total']:.2f}"
+            )
+            self._bot_var.set(self.bot_text(mins))
+            self._alert_var.set(" • ".join(alert_texts))
 
-        self.confirm_pix_btn = ctk.CTkButton(self.content, text="CONFIRMAR PIX", fg_color="#c62828", command=self.safe(self.confirm_pix))
-        self.confirm_pix_btn.pack(fill="x", pady=4)
+    class ActionPanelWindow(ctk.CTkToplevel):
+        def __init__(self, dashboard, card: OrderCard):
+            super().__init__(dashboard)
+            self.dashboard = dashboard
+            self.card = card
+            self.order = card.order
+            self.controller = dashboard.controller
 
-        self.receive_btn = ctk.CTkButton(self.content, text="RECEBER PAGAMENTO", command=self.safe(self.receive_payment))
-        self.receive_btn.pack(fill="x", pady=4)
+            self.title(f"Pedido #{self.order['id']}")
+            self.geometry("430x520")
+            self.protocol("WM_DELETE_WINDOW", self.close)
+            self.bind("<Escape>", lambda _e: self.close())
 
-        self.motoboy_menu = ctk.CTkOptionMenu(self.content, values=self.dashboard.active_motoboys_names(), command=self.safe(self.assign_motoboy))
-        self.motoboy_menu.pack(fill="x", pady=4)
+            self.content = ctk.CTkFrame(self)
+            self.content.pack(fill="both", expand=True, padx=10, pady=10)
 
-        self.obs_entry = ctk.CTkEntry(self.content, placeholder_text="Adicionar observação")
-        self.obs_entry.pack(fill="x", pady=4)
+            self.title_lbl = ctk.CTkLabel(self.content, text="", anchor="w", font=("Segoe UI", 18, "bold"))
+            self.title_lbl.pack(fill="x", pady=(0, 8))
 
-        self.obs_btn = ctk.CTkButton(self.content, text="SALVAR OBSERVAÇÃO", command=self.safe(self.save_observation))
-        self.obs_btn.pack(fill="x", pady=4)
+            self.info_lbl = ctk.CTkLabel(self.content, text="", justify="left", anchor="w")
+            self.info_lbl.pack(fill="x", pady=(0, 12))
 
-        self.manage_lbl = ctk.CTkLabel(self.content, text="Gestão:")
-        self.manage_lbl.pack(fill="x", pady=(10, 4))
+            self.confirm_pix_btn = ctk.CTkButton(self.content, text="CONFIRMAR PIX", fg_color="#c62828", command=self.safe(self.confirm_pix))
+            self.confirm_pix_btn.pack(fill="x", pady=4)
 
-        self.edit_btn = ctk.CTkButton(self.content, text="Editar Pedido", command=self.safe(lambda: self.dashboard.toast("Editar em breve")))
-        self.edit_btn.pack(fill="x", pady=2)
-        self.ocorr_btn = ctk.CTkButton(self.content, text="Registrar Ocorrência", command=self.safe(lambda: self.dashboard.toast("Ocorrência registrada")))
-        self.ocorr_btn.pack(fill="x", pady=2)
-        self.cancel_btn = ctk.CTkButton(self.content, text="Cancelar Pedido", fg_color="#7f1d1d", command=self.safe(self.cancel_order))
-        self.cancel_btn.pack(fill="x", pady=2)
+            self.receive_btn = ctk.CTkButton(self.content, text="RECEBER PAGAMENTO", command=self.safe(self.receive_payment))
+            self.receive_btn.pack(fill="x", pady=4)
 
-        self.close_btn = ctk.CTkButton(self.content, text="X Fechar", fg_color="#444", command=self.close)
-        self.close_btn.pack(fill="x", pady=(12, 0))
+            self.motoboy_menu = ctk.CTkOptionMenu(self.content, values=self.dashboard.active_motoboys_names(), command=self.safe(self.assign_motoboy))
+            self.motoboy_menu.pack(fill="x", pady=4)
 
-        self.refresh()
+            self.obs_entry = ctk.CTkEntry(self.content, placeholder_text="Adicionar observação")
+            self.obs_entry.pack(fill="x", pady=4)
 
-    def safe(self, callback):
-        def inner(*args, **kwargs):
-            try:
-                return callback(*args, **kwargs)
-            except Exception as exc:
-                self.dashboard.toast(f"Erro: {exc}")
-
-        return inner
-
-    def refresh(self):
-        self.order = Pedido.get_by_id(self.order.id)
-        self.card.order = self.order
-        self.title_lbl.configure(text=f"Pedido #{self.order.id} • {self.order.cliente}")
-        bairro = self.order.bairro.nome if self.order.bairro else "-"
-        moto = self.order.motoboy.nome if self.order.motoboy else "Sem motoboy"
-        self.info_lbl.configure(
-            text=(
-                f"Canal: {self.order.canal}\n"
-                f"Status: {self.order.status}\n"
-                f"Bairro: {bairro}\n"
-                f"Pagamento: {self.order.forma_pagamento} | PIX confirmado: {self.order.pix_confirmado}\n"
-                f"Motoboy: {moto}"
-            )
-        )
-        if self.order.forma_pagamento.upper() == "PIX" and not self.order.pix_confirmado:
-            self.confirm_pix_btn.configure(state="normal", fg_color="#c62828")
-        else:
-            self.confirm_pix_btn.configure(state="disabled", fg_color="#2e7d32")
+            self.obs_btn = ctk.CTkButton(self.content, text="SALVAR OBSERVAÇÃO", command=self.safe(self.save_observation))
+            self.obs_btn.pack(fill="x", pady=4)
 
-        self.card.refresh_ui_content()
+            self.manage_lbl = ctk.CTkLabel(self.content, text="Gestão:")
+            self.manage_lbl.pack(fill="x", pady=(10, 4))
 
-    def confirm_pix(self):
-        self.controller.confirm_pix(self.order)
-        self.refresh()
+            self.edit_btn = ctk.CTkButton(self.content, text="Editar Pedido", command=self.safe(lambda: self.dashboard.toast("Editar em breve")))
+            self.edit_btn.pack(fill="x", pady=2)
+            self.ocorr_btn = ctk.CTkButton(self.content, text="Registrar Ocorrência", command=self.safe(lambda: self.dashboard.toast("Ocorrência registrada")))
+            self.ocorr_btn.pack(fill="x", pady=2)
+            self.cancel_btn = ctk.CTkButton(self.content, text="Cancelar Pedido", fg_color="#7f1d1d", command=self.safe(self.cancel_order))
+            self.cancel_btn.pack(fill="x", pady=2)
 
-    def receive_payment(self):
-        self.controller.receive_payment(self.order)
-        self.refresh()
+            self.close_btn = ctk.CTkButton(self.content, text="X Fechar", fg_color="#444", command=self.close)
+            self.close_btn.pack(fill="x", pady=(12, 0))
 
-    def assign_motoboy(self, nome: str):
-        if not nome:
-            return
-        motoboy = Motoboy.get_or_none(Motoboy.nome == nome)
-        if motoboy:
-            self.controller.assign_motoboy(self.order, motoboy)
             self.refresh()
 
-    def save_observation(self):
-        txt = self.obs_entry.get().strip()
-        if txt:
-            self.controller.update_observation(self.order, txt)
-            self.obs_entry.delete(0, "end")
-            self.refresh()
+        def safe(self, callback):
+            def inner(*args, **kwargs):
+                try:
+                    return callback(*args, **kwargs)
+                except Exception as exc:
+                    self.dashboard.toast(f"Erro: {exc}")
+
+            return inner
+
+        def refresh(self):
+            self.order = self.controller.fetch_order(self.order["id"])
+            self.card.set_order(self.order)
+            self.dashboard.refresh_summary(self.order)
+            self.title_lbl.configure(text=f"Pedido #{self.order['id']} • {self.order['cliente']}")
+            bairro = self.order["bairro_nome"] or "-"
+            moto = self.order["motoboy_nome"] or "Sem motoboy"
+            self.info_lbl.configure(
+                text=(
+                    f"Canal: {self.order['canal']}\n"
+                    f"Status: {self.order['status']}\n"
+                    f"Bairro: {bairro}\n"
+                    f"Pagamento: {self.order['forma_pagamento']} | PIX confirmado: {self.order['pix_confirmado']}\n"
+                    f"Motoboy: {moto}"
+                )
+            )
+            if self.card.forma_upper == "PIX" and not self.order["pix_confirmado"]:
+                self.confirm_pix_btn.configure(state="normal", fg_color="#c62828")
+            else:
+                self.confirm_pix_btn.configure(state="disabled", fg_color="#2e7d32")
 
-    def cancel_order(self):
-        self.order.status = "CANCELADO"
-        self.order.save()
-        self.controller.log("Cancelou pedido", self.order)
-        self.refresh()
-
-    def close(self):
-        self.destroy()
-
-
-class Dashboard(ctk.CTk):
-    def __init__(self, usuario: Usuario):
-        super().__init__()
-        self.usuario = usuario
-        self.controller = OrderController(usuario)
-        self.selected_card: Optional[OrderCard] = None
-        self.cards: List[OrderCard] = []
-        self.action_panel: Optional[ActionPanelWindow] = None
-        self.route_mode_active = False
-        self.route_motoboy: Optional[Motoboy] = None
-
-        ctk.set_appearance_mode("Dark")
-        self.current_theme = "DARK"
-        self.theme_tokens = THEMES[self.current_theme]
-        self.current_zoom = "NORMAL"
-
-        self.title("BDF Delivery Cockpit")
-        self.geometry("1440x900")
-        self.configure(fg_color=self.theme_tokens["bg"])
-
-        self.build_header()
-        self.build_list()
-        self.bind_shortcuts()
-        self.populate_orders()
-
-    def build_header(self):
-        self.header = ctk.CTkFrame(self, fg_color=self.theme_tokens["panel"], corner_radius=0)
-        self.header.pack(fill="x")
-
-        self.logo_lbl = ctk.CTkLabel(self.header, text="🍔 BDF DELIVERY", font=("Segoe UI", 24, "bold"))
-        self.logo_lbl.pack(side="left", padx=12, pady=8)
-
-        self.caixa_lbl = ctk.CTkLabel(self.header, text="✅ CAIXA ABERTO", text_color="#31d158", font=("Segoe UI", 14, "bold"))
-        self.caixa_lbl.pack(side="left", padx=10)
-
-        self.route_btn = ctk.CTkButton(self.header, text="ROTA", width=80, command=self.toggle_route_mode)
-        self.route_btn.pack(side="left", padx=6)
-
-        self.top_btn = ctk.CTkButton(self.header, text="VOLTAR AO TOPO", width=130, command=self.scroll_top)
-        self.top_btn.pack(side="left", padx=6)
-
-        self.new_btn = ctk.CTkButton(self.header, text="NOVO PEDIDO (F4)", width=140, command=self.open_new_order)
-        self.new_btn.pack(side="left", padx=6)
-
-        self.quick_lbl = ctk.CTkLabel(self.header, text="Histórico | Backup | Financeiro | Admin")
-        self.quick_lbl.pack(side="left", padx=12)
-
-        self.zoom_menu = ctk.CTkOptionMenu(self.header, values=list(ZOOM_PRESETS.keys()), command=self.set_zoom)
-        self.zoom_menu.set(self.current_zoom)
-        self.zoom_menu.pack(side="right", padx=6)
-
-        self.theme_menu = ctk.CTkOptionMenu(self.header, values=list(THEMES.keys()), command=self.set_theme)
-        self.theme_menu.set(self.current_theme)
-        self.theme_menu.pack(side="right", padx=6)
-
-        self.user_lbl = ctk.CTkLabel(self.header, text=f"👤 {self.usuario.login}")
-        self.user_lbl.pack(side="right", padx=12)
-
-    def build_list(self):
-        self.body = ctk.CTkFrame(self, fg_color=self.theme_tokens["bg"])
-        self.body.pack(fill="both", expand=True)
-
-        self.scroll = ctk.CTkScrollableFrame(self.body, fg_color=self.theme_tokens["bg"])
-        self.scroll.pack(fill="both", expand=True, padx=8, pady=8)
-
-    def bind_shortcuts(self):
-        self.bind("<Up>", lambda _e: self.move_selection(-1))
-        self.bind("<Down>", lambda _e: self.move_selection(1))
-        self.bind("<Return>", lambda _e: self.enter_selected())
-        self.bind("<F4>", lambda _e: self.open_new_order())
-
-    def populate_orders(self):
-        for card in self.cards:
-            card.destroy()
-        self.cards = []
-        preset = ZOOM_PRESETS[self.current_zoom]
-        for order in self.controller.fetch_orders():
-            card = OrderCard(self.scroll, order, self, preset["height"], preset["font"])
-            card.pack(fill="x", padx=6, pady=4)
-            self.cards.append(card)
-
-        if self.cards:
-            self.select_card(self.cards[0])
-
-    def refresh_single_order_card(self, card: OrderCard):
-        card.order = Pedido.get_by_id(card.order.id)
-        card.refresh_ui_content()
-        if self.action_panel and self.action_panel.winfo_exists() and self.action_panel.card is card:
-            self.action_panel.refresh()
-
-    def select_card(self, card: OrderCard):
-        self.selected_card = card
-        for c in self.cards:
-            c.refresh_ui_content()
-        self.after(10, lambda: card.focus_set())
-
-    def move_selection(self, step: int):
-        if not self.cards:
-            return
-        if self.selected_card not in self.cards:
-            self.select_card(self.cards[0])
-            return
-        i = self.cards.index(self.selected_card)
-        nxt = max(0, min(len(self.cards) - 1, i + step))
-        self.select_card(self.cards[nxt])
-        y = nxt / max(1, len(self.cards) - 1)
-        self.scroll._parent_canvas.yview_moveto(y)
-
-    def enter_selected(self):
-        if self.selected_card:
-            self.open_action_panel(self.selected_card)
-
-    def open_action_panel(self, card: OrderCard):
-        if self.action_panel and self.action_panel.winfo_exists():
-            self.action_panel.card = card
-            self.action_panel.order = card.order
-            self.action_panel.refresh()
-            self.action_panel.focus()
-            return
-        self.action_panel = ActionPanelWindow(self, card)
-
-    def set_theme(self, theme_name: str):
-        self.current_theme = theme_name
-        self.theme_tokens = THEMES[theme_name]
-        self.configure(fg_color=self.theme_tokens["bg"])
-        self.header.configure(fg_color=self.theme_tokens["panel"])
-        self.body.configure(fg_color=self.theme_tokens["bg"])
-        self.scroll.configure(fg_color=self.theme_tokens["bg"])
-        for card in self.cards:
-            card.refresh_ui_content()
+            self.card.refresh_ui_content()
 
-    def set_zoom(self, zoom_name: str):
-        self.current_zoom = zoom_name
-        self.populate_orders()
+        def pedido(self) -> Pedido:
+            return Pedido.get_by_id(self.order["id"])
 
-    def scroll_top(self):
-        self.scroll._parent_canvas.yview_moveto(0)
+        def confirm_pix(self):
+            self.controller.confirm_pix(self.pedido())
+            self.refresh()
 
-    def active_motoboys_names(self) -> List[str]:
-        return [m.nome for m in Motoboy.select().where(Motoboy.ativo == True)]
+        def receive_payment(self):
+            self.controller.receive_payment(self.pedido())
+            self.refresh()
 
-    def toggle_route_mode(self):
-        if self.route_mode_active:
-            self.route_mode_active = False
-            self.route_motoboy = None
-            self.header.configure(fg_color=self.theme_tokens["panel"])
-            self.route_btn.configure(text="ROTA")
-            return
+        def assign_motoboy(self, nome: str):
+            if not nome:
+                return
+            motoboy = Motoboy.get_or_none(Motoboy.nome == nome)
+            if motoboy:
+                self.controller.assign_motoboy(self.pedido(), motoboy)
+                self.refresh()
+
+        def save_observation(self):
+            txt = self.obs_entry.get().strip()
+            if txt:
+                self.controller.update_observation(self.pedido(), txt)
+                self.obs_entry.delete(0, "end")
+                self.refresh()
+
+        def cancel_order(self):
+            pedido = self.pedido()
+            pedido.status = "CANCELADO"
+            pedido.save()
+            self.controller.log("Cancelou pedido", pedido)
+            self.refresh()
 
-        names = self.active_motoboys_names()
-        if not names:
-            self.toast("Nenhum motoboy ativo")
-            return
-        selected_name = names[0]
-        self.route_motoboy = Motoboy.get(Motoboy.nome == selected_name)
-        self.route_mode_active = True
-        self.header.configure(fg_color="#ff8c00")
-        self.route_btn.configure(text="PARAR")
-
-    def route_assign_order(self, order: Pedido, card: OrderCard):
-        if not self.route_mode_active or not self.route_motoboy:
-            return
-        try:
-            self.controller.assign_motoboy(order, self.route_motoboy, status="EM ROTA")
-            self.refresh_single_order_card(card)
-        except Exception as exc:
-            self.toast(str(exc))
-
-    def open_new_order(self):
-        win = ctk.CTkToplevel(self)
-        win.title("Novo Pedido")
-        win.geometry("420x470")
-
-        cliente = ctk.CTkEntry(win, placeholder_text="Cliente")
-        cliente.pack(fill="x", padx=12, pady=6)
-        canal = ctk.CTkOptionMenu(win, values=["WhatsApp", "iFood", "BALCÃO"])
-        canal.set("WhatsApp")
-        canal.pack(fill="x", padx=12, pady=6)
-        bairro = ctk.CTkOptionMenu(win, values=[b.nome for b in Bairro.select()])
-        bairro.pack(fill="x", padx=12, pady=6)
-        valor_produtos = ctk.CTkEntry(win, placeholder_text="Valor produtos")
-        valor_produtos.pack(fill="x", padx=12, pady=6)
-        taxa = ctk.CTkEntry(win, placeholder_text="Taxa de entrega")
-        taxa.pack(fill="x", padx=12, pady=6)
-        forma = ctk.CTkOptionMenu(win, values=["PIX", "DINHEIRO", "A RECEBER"])
-        forma.set("PIX")
-        forma.pack(fill="x", padx=12, pady=6)
-
-        info = ctk.CTkLabel(win, text="")
-        info.pack(fill="x", padx=12, pady=2)
-
-        def on_canal_change(choice):
-            if choice.upper() == "BALCÃO":
-                taxa.delete(0, "end")
-                taxa.insert(0, "0")
-                info.configure(text="BALCÃO: taxa zerada. Enter no valor confirma forma de pagamento.")
+        def close(self):
+            self.destroy()
+
+    class Dashboard(ctk.CTk):
+        def __init__(self, usuario: Usuario):
+            super().__init__()
+            self.usuario = usuario
+            self.controller = OrderController(usuario)
+            self.selected_card: Optional[OrderCard] = None
+            self.cards_by_id: Dict[int, OrderCard] = {}
+            self._order_ids: List[int] = []
+            self._idx_by_id: Dict[int, int] = {}
+            self._selected_idx: Optional[int] = None
+            self.action_panel: Optional[ActionPanelWindow] = None
+            self.route_mode_active = False
+            self.route_motoboy: Optional[Motoboy] = None
+            self._bairros_cache: Optional[List[str]] = None
+            self._motoboys_cache: Optional[List[str]] = None
+            self.now_cache = datetime.now()
+            self._log_flush_delay = LOG_FLUSH_MS
+
+            ctk.set_appearance_mode("Dark")
+            self.current_theme = "DARK"
+            self.theme_tokens = THEMES[self.current_theme]
+            self.current_zoom = "NORMAL"
+
+            self.title("BDF Delivery Cockpit")
+            self.geometry("1440x900")
+            self.configure(fg_color=self.theme_tokens["bg"])
+
+            self.build_header()
+            self.build_list()
+            self.bind_shortcuts()
+            self.populate_orders()
+            self.after(30_000, self.tick_clock)
+            self.after(self._log_flush_delay, self._flush_logs)
+            self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        def build_header(self):
+            self.header = ctk.CTkFrame(self, fg_color=self.theme_tokens["panel"], corner_radius=0)
+            self.header.pack(fill="x")
+
+            self.logo_lbl = ctk.CTkLabel(self.header, text="🍔 BDF DELIVERY", font=("Segoe UI", 24, "bold"))
+            self.logo_lbl.pack(side="left", padx=12, pady=8)
+
+            self.caixa_lbl = ctk.CTkLabel(self.header, text="✅ CAIXA ABERTO", text_color="#31d158", font=("Segoe UI", 14, "bold"))
+            self.caixa_lbl.pack(side="left", padx=10)
+
+            self.summary_lbl = ctk.CTkLabel(self.header, text="", font=("Segoe UI", 14, "bold"))
+            self.summary_lbl.pack(side="left", padx=10)
+
+            self.route_btn = ctk.CTkButton(self.header, text="ROTA", width=80, command=self.toggle_route_mode)
+            self.route_btn.pack(side="left", padx=6)
+
+            self.top_btn = ctk.CTkButton(self.header, text="VOLTAR AO TOPO", width=130, command=self.scroll_top)
+            self.top_btn.pack(side="left", padx=6)
+
+            self.new_btn = ctk.CTkButton(self.header, text="NOVO PEDIDO (F4)", width=140, command=self.open_new_order)
+            self.new_btn.pack(side="left", padx=6)
+
+            self.quick_lbl = ctk.CTkLabel(self.header, text="Histórico | Backup | Financeiro | Admin")
+            self.quick_lbl.pack(side="left", padx=12)
+
+            self.zoom_menu = ctk.CTkOptionMenu(self.header, values=list(ZOOM_PRESETS.keys()), command=self.set_zoom)
+            self.zoom_menu.set(self.current_zoom)
+            self.zoom_menu.pack(side="right", padx=6)
+
+            self.theme_menu = ctk.CTkOptionMenu(self.header, values=list(THEMES.keys()), command=self.set_theme)
+            self.theme_menu.set(self.current_theme)
+            self.theme_menu.pack(side="right", padx=6)
+
+            self.user_lbl = ctk.CTkLabel(self.header, text=f"👤 {self.usuario.login}")
+            self.user_lbl.pack(side="right", padx=12)
+
+        def build_list(self):
+            self.body = ctk.CTkFrame(self, fg_color=self.theme_tokens["bg"])
+            self.body.pack(fill="both", expand=True)
+
+            self.scroll = ctk.CTkScrollableFrame(self.body, fg_color=self.theme_tokens["bg"])
+            self.scroll.pack(fill="both", expand=True, padx=8, pady=8)
+
+            self.bind_class(OrderCard.click_tag, "<Button-1>", self._on_body_click)
+            self.bind_class(OrderCard.click_tag, "<Double-Button-1>", self._on_body_double_click)
+
+        def _card_from_event(self, event) -> Optional[OrderCard]:
+            w = event.widget
+            while w is not None and not isinstance(w, OrderCard):
+                w = getattr(w, "master", None)
+            return w
+
+        def _on_body_click(self, event):
+            card = self._card_from_event(event)
+            if card is not None:
+                card.on_click()
+
+        def _on_body_double_click(self, event):
+            card = self._card_from_event(event)
+            if card is not None:
+                card.on_double_click()
+
+        def bind_shortcuts(self):
+            self.bind("<Up>", lambda _e: self.move_selection(-1))
+            self.bind("<Down>", lambda _e: self.move_selection(1))
+            self.bind("<Return>", lambda _e: self.enter_selected())
+            self.bind("<F4>", lambda _e: self.open_new_order())
+
+        def _flush_logs(self):
+            try:
+                self.controller.flush_logs()
+            except Exception as exc:
+                if self._log_flush_delay == LOG_FLUSH_MS:
+                    self.toast(f"Erro ao gravar log: {exc}")
+                self._log_flush_delay = min(self._log_flush_delay * 2, LOG_FLUSH_MAX_MS)
             else:
-                info.configure(text="")
+                self._log_flush_delay = LOG_FLUSH_MS
+            self.after(self._log_flush_delay, self._flush_logs)
 
-        canal.configure(command=on_canal_change)
-
-        def save_order(_event=None):
+        def on_close(self):
             try:
-                c = cliente.get().strip() or "Cliente"
-                cn = canal.get()
-                b = Bairro.get_or_none(Bairro.nome == bairro.get())
-                vp = float(valor_produtos.get() or "0")
-                tx = 0.0 if cn.upper() == "BALCÃO" else float(taxa.get() or "0")
-                fp = forma.get()
-
-                if cn.upper() == "BALCÃO" and fp == "A RECEBER":
-                    self.toast("Balcão configurado: pagar na retirada")
-
-                Pedido.create(
-                    cliente=c,
-                    canal=cn,
-                    status="PIX PENDENTE" if fp == "PIX" else "NOVO",
-                    valor_produtos=vp,
-                    taxa_entrega=tx,
-                    valor_total=vp + tx,
-                    bairro=b,
-                    forma_pagamento=fp,
-                    pix_confirmado=(fp != "PIX"),
-                )
-                self.controller.log("Criou novo pedido")
-                win.destroy()
-                self.populate_orders()
+                self.controller.flush_logs()
+            finally:
+                self.destroy()
+
+        def tick_clock(self):
+            self.now_cache = datetime.now()
+            arr = self.controller.order_array
+            for pedido_id, mins in zip(arr["id"].tolist(), elapsed_minutes(arr["ts"], self.now_cache.timestamp()).tolist()):
+                card = self.cards_by_id.get(pedido_id)
+                if card is not None:
+                    card.update_elapsed(mins)
+            self.after(30_000, self.tick_clock)
+
+        def populate_orders(self):
+            preset = ZOOM_PRESETS[self.current_zoom]
+            self.now_cache = datetime.now()
+            with db.atomic():
+                orders = self.controller.fetch_orders()
+                for pedido_id in set(self.cards_by_id) - {o["id"] for o in orders}:
+                    card = self.cards_by_id.pop(pedido_id)
+                    if card is self.selected_card:
+                        self.selected_card = None
+                    card.destroy()
+
+                cards_by_id: Dict[int, OrderCard] = {}
+                below: Optional[OrderCard] = None
+                for order in reversed(orders):
+                    card = self.cards_by_id.get(order["id"])
+                    if card is None:
+                        card = OrderCard(self.scroll, order, self, preset["height"], preset["font"])
+                        if below is None:
+                            card.pack(fill="x", padx=6, pady=4)
+                        else:
+                            card.pack(fill="x", padx=6, pady=4, before=below)
+                    else:
+                        card.set_order(order)
+                        card.set_density(preset["height"], preset["font"])
+                        card.refresh_ui_content(now=self.now_cache)
+                    cards_by_id[order["id"]] = card
+                    below = card
+                self.cards_by_id = dict(reversed(cards_by_id.items()))
+
+            self._order_ids = list(self.cards_by_id)
+            self._idx_by_id = {pedido_id: i for i, pedido_id in enumerate(self._order_ids)}
+            self._selected_idx = None
+            self.refresh_summary()
+            if self._order_ids:
+                self.select_card(self.cards_by_id[self._order_ids[0]])
+
+        def refresh_summary(self, row: Optional[Dict[str, Any]] = None):
+            if row is not None:
+                self.controller.update_order_array(row)
+            count, total = self.controller.summary_today(self.now_cache)
+            self.summary_lbl.configure(text=f"Hoje: R$ {total:.2f} em {count} pedidos")
+
+        def refresh_single_order_card(self, card: OrderCard):
+            card.set_order(self.controller.fetch_order(card.order["id"]))
+            self.now_cache = datetime.now()
+            card.refresh_ui_content(now=self.now_cache)
+            self.refresh_summary(card.order)
+            if self.action_panel and self.action_panel.winfo_exists() and self.action_panel.card is card:
+                self.action_panel.refresh()
+
+        def select_card(self, card: OrderCard):
+            prev = self.selected_card
+            self.selected_card = card
+            self._selected_idx = self._idx_by_id.get(card.order["id"])
+            if prev is not None and prev is not card and prev.winfo_exists():
+                prev.refresh_ui_content()
+            card.refresh_ui_content()
+            self.after(10, lambda: card.focus_set())
+
+        def move_selection(self, step: int):
+            if not self._order_ids:
+                return
+            if self._selected_idx is None:
+                self.select_card(self.cards_by_id[self._order_ids[0]])
+                return
+            nxt = max(0, min(len(self._order_ids) - 1, self._selected_idx + step))
+            self.select_card(self.cards_by_id[self._order_ids[nxt]])
+            y = nxt / max(1, len(self._order_ids) - 1)
+            self.scroll._parent_canvas.yview_moveto(y)
+
+        def enter_selected(self):
+            if self.selected_card:
+                self.open_action_panel(self.selected_card)
+
+        def open_action_panel(self, card: OrderCard):
+            if self.action_panel and self.action_panel.winfo_exists():
+                self.action_panel.card = card
+                self.action_panel.order = card.order
+                self.action_panel.refresh()
+                self.action_panel.focus()
+                return
+            self.action_panel = ActionPanelWindow(self, card)
+
+        def set_theme(self, theme_name: str):
+            self.current_theme = theme_name
+            self.theme_tokens = THEMES[theme_name]
+            self.configure(fg_color=self.theme_tokens["bg"])
+            self.header.configure(fg_color=self.theme_tokens["panel"])
+            self.body.configure(fg_color=self.theme_tokens["bg"])
+            self.scroll.configure(fg_color=self.theme_tokens["bg"])
+            for card in self.cards_by_id.values():
+                card.refresh_ui_content()
+
+        def set_zoom(self, zoom_name: str):
+            self.current_zoom = zoom_name
+            self.populate_orders()
+
+        def scroll_top(self):
+            self.scroll._parent_canvas.yview_moveto(0)
+
+        def bairros_names(self) -> List[str]:
+            if self._bairros_cache is None:
+                self._bairros_cache = [b.nome for b in Bairro.select()]
+            return self._bairros_cache
+
+        def active_motoboys_names(self) -> List[str]:
+            if self._motoboys_cache is None:
+                self._motoboys_cache = [m.nome for m in Motoboy.select().where(Motoboy.ativo == True)]
+            return self._motoboys_cache
+
+        def toggle_route_mode(self):
+            if self.route_mode_active:
+                self.route_mode_active = False
+                self.route_motoboy = None
+                self.header.configure(fg_color=self.theme_tokens["panel"])
+                self.route_btn.configure(text="ROTA")
+                return
+
+            names = self.active_motoboys_names()
+            if not names:
+                self.toast("Nenhum motoboy ativo")
+                return
+            selected_name = names[0]
+            self.route_motoboy = Motoboy.get(Motoboy.nome == selected_name)
+            self.route_mode_active = True
+            self.header.configure(fg_color="#ff8c00")
+            self.route_btn.configure(text="PARAR")
+
+        def route_assign_order(self, card: OrderCard):
+            if not self.route_mode_active or not self.route_motoboy:
+                return
+            try:
+                pedido = Pedido.get_by_id(card.order["id"])
+                self.controller.assign_motoboy(pedido, self.route_motoboy, status="EM ROTA")
+                self.refresh_single_order_card(card)
             except Exception as exc:
-                self.toast(f"Erro ao salvar: {exc}")
-
-        save_btn = ctk.CTkButton(win, text="SALVAR", command=save_order)
-        save_btn.pack(fill="x", padx=12, pady=12)
-
-        win.bind("<Return>", save_order)
-
-    def toast(self, text: str):
-        top = ctk.CTkToplevel(self)
-        top.geometry("360x80")
-        top.title("Aviso")
-        ctk.CTkLabel(top, text=text).pack(expand=True, fill="both", padx=10, pady=10)
-        top.after(1500, top.destroy)
+                self.toast(str(exc))
+
+        def open_new_order(self):
+            win = ctk.CTkToplevel(self)
+            win.title("Novo Pedido")
+            win.geometry("420x470")
+
+            cliente = ctk.CTkEntry(win, placeholder_text="Cliente")
+            cliente.pack(fill="x", padx=12, pady=6)
+            canal = ctk.CTkOptionMenu(win, values=["WhatsApp", "iFood", "BALCÃO"])
+            canal.set("WhatsApp")
+            canal.pack(fill="x", padx=12, pady=6)
+            bairro = ctk.CTkOptionMenu(win, values=self.bairros_names())
+            bairro.pack(fill="x", padx=12, pady=6)
+            valor_produtos = ctk.CTkEntry(win, placeholder_text="Valor produtos")
+            valor_produtos.pack(fill="x", padx=12, pady=6)
+            taxa = ctk.CTkEntry(win, placeholder_text="Taxa de entrega")
+            taxa.pack(fill="x", padx=12, pady=6)
+            forma = ctk.CTkOptionMenu(win, values=["PIX", "DINHEIRO", "A RECEBER"])
+            forma.set("PIX")
+            forma.pack(fill="x", padx=12, pady=6)
+
+            info = ctk.CTkLabel(win, text="")
+            info.pack(fill="x", padx=12, pady=2)
+
+            def on_canal_change(choice):
+                if choice.upper() == "BALCÃO":
+                    taxa.delete(0, "end")
+                    taxa.insert(0, "0")
+                    info.configure(text="BALCÃO: taxa zerada. Enter no valor confirma forma de pagamento.")
+                else:
+                    info.configure(text="")
+
+            canal.configure(command=on_canal_change)
+
+            def save_order(_event=None):
+                try:
+                    c = cliente.get().strip() or "Cliente"
+                    cn = canal.get()
+                    b = Bairro.get_or_none(Bairro.nome == bairro.get())
+                    vp = float(valor_produtos.get() or "0")
+                    tx = 0.0 if cn.upper() == "BALCÃO" else float(taxa.get() or "0")
+                    fp = forma.get()
+
+                    if cn.upper() == "BALCÃO" and fp == "A RECEBER":
+                        self.toast("Balcão configurado: pagar na retirada")
+
+                    Pedido.create(
+                        cliente=c,
+                        canal=cn,
+                        status="PIX PENDENTE" if fp == "PIX" else "NOVO",
+                        valor_produtos=vp,
+                        taxa_entrega=tx,
+                        valor_total=vp + tx,
+                        bairro=b,
+                        forma_pagamento=fp,
+                        pix_confirmado=(fp != "PIX"),
+                    )
+                    self.controller.log("Criou novo pedido")
+                    win.destroy()
+                    self.populate_orders()
+                except Exception as exc:
+                    self.toast(f"Erro ao salvar: {exc}")
+
+            save_btn = ctk.CTkButton(win, text="SALVAR", command=save_order)
+            save_btn.pack(fill="x", padx=12, pady=12)
+
+            win.bind("<Return>", save_order)
+
+        def toast(self, text: str):
+            top = ctk.CTkToplevel(self)
+            top.geometry("360x80")
+            top.title("Aviso")
+            ctk.CTkLabel(top, text=text).pack(expand=True, fill="both", padx=10, pady=10)
+            top.after(1500, top.destroy)
+
+    return Dashboard
 
 
 # =========================
 # BOOTSTRAP
 # =========================
 def password_hash(raw: str) -> str:
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=32).hexdigest()
+
+
+def legacy_password_hash(raw: str) -> str:
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
+def check_password(usuario: Usuario, raw: str) -> bool:
+    if hmac.compare_digest(usuario.senha_hash, password_hash(raw)):
+        return True
+    if hmac.compare_digest(usuario.senha_hash, legacy_password_hash(raw)):
+        usuario.senha_hash = password_hash(raw)
+        usuario.save()
+        return True
+    return False
+
+
 def seed_data():
     db.connect(reuse_if_open=True)
-    db.create_tables([Usuario, Motoboy, Bairro, Caixa, Configuracao, Pedido, LogAtividade])
-
-    admin = Usuario.get_or_none(Usuario.login == "admin")
-    if not admin:
-        admin = Usuario.create(login="admin", senha_hash=password_hash("admin"), admin=True)
-
-    if Motoboy.select().count() == 0:
-        for nome in ["Carlos", "Renan", "Maya"]:
-            Motoboy.create(nome=nome, ativo=True)
-
-    if Bairro.select().count() == 0:
-        for nome, taxa in [("Centro", 5), ("Jardim", 8), ("Industrial", 10)]:
-            Bairro.create(nome=nome, taxa_entrega=taxa)
-
-    if Caixa.select().count() == 0:
-        Caixa.create(aberto=True)
-
-    if Pedido.select().count() == 0:
-        centro = Bairro.get(Bairro.nome == "Centro")
-        Pedido.create(
-            cliente="Ana Souza",
-            canal="WhatsApp",
-            status="PIX PENDENTE",
-            valor_produtos=42.0,
-            taxa_entrega=5.0,
-            valor_total=47.0,
-            bairro=centro,
-            forma_pagamento="PIX",
-            pix_confirmado=False,
-            observacao="Sem cebola",
-        )
-        Pedido.create(
-            cliente="Marcos Lima",
-            canal="BALCÃO",
-            status="NOVO",
-            valor_produtos=25,
-            taxa_entrega=0,
-            valor_total=25,
-            bairro=centro,
-            forma_pagamento="A RECEBER",
-            pix_confirmado=True,
-        )
+    with db.atomic():
+        if db.user_version < SCHEMA_VERSION:
+            db.create_tables([Usuario, Motoboy, Bairro, Caixa, Configuracao, Pedido, LogAtividade])
+            db.user_version = SCHEMA_VERSION
+
+        admin = Usuario.get_or_none(Usuario.login == "admin")
+        if not admin:
+            admin = Usuario.create(login="admin", senha_hash=password_hash("admin"), admin=True)
+
+        if Motoboy.select().count() == 0:
+            Motoboy.insert_many([{"nome": nome, "ativo": True} for nome in ["Carlos", "Renan", "Maya"]]).execute()
+
+        if Bairro.select().count() == 0:
+            Bairro.insert_many(
+                [{"nome": nome, "taxa_entrega": taxa} for nome, taxa in [("Centro", 5), ("Jardim", 8), ("Industrial", 10)]]
+            ).execute()
+
+        if Caixa.select().count() == 0:
+            Caixa.create(aberto=True)
+
+        if Pedido.select().count() == 0:
+            centro = Bairro.get(Bairro.nome == "Centro")
+            Pedido.insert_many(
+                [
+                    {
+                        "cliente": "Ana Souza",
+                        "canal": "WhatsApp",
+                        "status": "PIX PENDENTE",
+                        "valor_produtos": 42.0,
+                        "taxa_entrega": 5.0,
+                        "valor_total": 47.0,
+                        "bairro": centro,
+                        "forma_pagamento": "PIX",
+                        "pix_confirmado": False,
+                        "observacao": "Sem cebola",
+                    },
+                    {
+                        "cliente": "Marcos Lima",
+                        "canal": "BALCÃO",
+                        "status": "NOVO",
+                        "valor_produtos": 25,
+                        "taxa_entrega": 0,
+                        "valor_total": 25,
+                        "bairro": centro,
+                        "forma_pagamento": "A RECEBER",
+                        "pix_confirmado": True,
+                        "observacao": None,
+                    },
+                ]
+            ).execute()
 
     return admin
 
 
 def main():
     user = seed_data()
-    app = Dashboard(user)
-    app.mainloop()
+    try:
+        app = _build_ui()(user)
+        app.mainloop()
+    finally:
+        db.close()
+        db.close_all()
 
 
 if __name__ == "__main__":